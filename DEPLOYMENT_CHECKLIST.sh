@@ -96,7 +96,7 @@ Push to registry:
 
 Verify image:
   $ docker inspect REGISTRY/reactive-autoscaler:v1
-  $ docker run --rm REGISTRY/reactive-autoscaler:v1 python -c "import kubernetes; print('OK')"
+  $ docker run --rm REGISTRY/reactive-autoscaler:v1 python -c "import kubernetes_asyncio; print('OK')"
 
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
@@ -365,7 +365,7 @@ Image Tag: _______________________
    kubectl get configmap autoscaler-config -o yaml
 
 4. Test components:
-   kubectl exec POD_NAME -- python -c "import kubernetes; print('OK')"
+   kubectl exec POD_NAME -- python -c "import kubernetes_asyncio; print('OK')"
 
 5. Check Prometheus:
    kubectl exec POD_NAME -- curl prometheus:9090/api/v1/query?query=up
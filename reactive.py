@@ -9,25 +9,42 @@ Architecture:
 4. Runs continuously as a control loop
 """
 import os
+import re
+import math
 import time
+import asyncio
 import logging
-from typing import Dict, List, Optional
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
-import requests
-from kubernetes import client, config
-from collections import defaultdict
+from enum import IntEnum
+from types import MappingProxyType
+import aiohttp
+import numpy as np
+import orjson
+from cachetools import TTLCache
+from kubernetes_asyncio import client, config, watch
+from collections import deque
 
 # ==================== CONFIGURATION ====================
+# RPS Thresholds with Hysteresis, indexed by replica count
+# (slot 0 is a -inf sentinel that keeps the tables sorted; rows below MIN_REPLICAS are never scaled)
+_UP = (-math.inf, 10.0, 30.0, 60.0, 100.0, math.inf)  # scale up at >= this RPS (5: never, max)
+_DOWN = (-math.inf, 0.0, 8.0, 25.0, 50.0, 90.0)      # scale down below this RPS (1: never, min)
+
+
 class AutoscalerConfig:
     """Central configuration for the autoscaler"""
     
     # Prometheus settings
     PROMETHEUS_URL =  os.getenv("PROMETHEUS_URL", "http://prometheus-server:9090") # Your Prometheus endpoint
     METRICS_QUERY_INTERVAL = 30  # Query metrics every 30 seconds
+    WARMUP_WINDOW = 300  # Seconds of history used to seed the EMA at startup
+    QUERY_TIMEOUT_S = 5  # Server-side PromQL timeout; the client gives up 1s later
     
     # Kubernetes settings
     KUBERNETES_NAMESPACE = "default"  # Namespace to watch
+    K8S_MAX_IN_FLIGHT = 8  # Concurrent scale/read requests allowed against the API server
+    PLAN_REFRESH_INTERVAL = 60  # Seconds between rebuilding service plans from the deployment set
     
     # Scaling parameters
     COOLDOWN_PERIOD = 60  # seconds between scaling actions
@@ -36,123 +53,438 @@ class AutoscalerConfig:
     MAX_REPLICAS = 10
     
     # RPS Thresholds with Hysteresis
-    RPS_THRESHOLDS = {
-        1: (10, 0),
-        2: (30, 8),
-        3: (60, 25),
-        4: (100, 50),
-        5: (float('inf'), 90)
-    }
+    RPS_UP_THRESHOLDS = _UP
+    RPS_DOWN_THRESHOLDS = _DOWN
+    # Read-only {replicas: (scale_up, scale_down)} view, kept for existing callers
+    RPS_THRESHOLDS = MappingProxyType({r: (_UP[r], _DOWN[r]) for r in range(1, len(_UP))})
     
     # Metrics configuration
-    RPS_METRIC_QUERY = 'sum(rate(http_requests_total{{service="{service}"}}[1m]))'
+    # {range} is filled in with 3x the Prometheus scrape interval, detected at startup
+    RPS_METRIC_QUERY = 'sum(rate(http_requests_total{{service="{service}"}}[{range}]))'
+    RPS_BULK_METRIC_QUERY = 'sum by (service) (rate(http_requests_total{{service=~"{services}"}}[{range}]))'
+    RATE_RANGE_SCRAPES = 3  # rate() window, in scrape intervals
+    DEFAULT_RATE_RANGE = "1m"  # used when the scrape interval can't be read
+    
+    # Number of scale events kept per service
+    SCALE_HISTORY_SIZE = 512
     
     # Logging
     LOG_LEVEL = logging.INFO
 
 
 # ==================== DATA STRUCTURES ====================
+# Scale event action codes
+ACTION_UPSCALE = 1
+ACTION_DOWNSCALE = 2
+
+
+class Reason(IntEnum):
+    """Why a scaling decision came out the way it did"""
+    STABLE = 0
+    SCALE_UP = 1
+    SCALE_UP_MAX = 2
+    SCALE_DOWN = 3
+    SCALE_DOWN_MIN = 4
+    COOLDOWN = 5
+    PAUSED = 6
+
+
+# Log text per reason - %-style so it is only rendered when a handler emits it
+REASON_MESSAGES = {
+    Reason.STABLE: "Stable: RPS %(rps).1f in range",
+    Reason.SCALE_UP: "Scale up: RPS %(rps).1f >= %(up).1f",
+    Reason.SCALE_UP_MAX: "Scale to max: RPS %(rps).1f",
+    Reason.SCALE_DOWN: "Scale down: RPS %(rps).1f < %(down).1f",
+    Reason.SCALE_DOWN_MIN: "Scale to min: RPS %(rps).1f",
+    Reason.COOLDOWN: "Cooldown: wait %(wait)ds",
+    Reason.PAUSED: "Paused: below min replicas, RPS %(rps).1f",
+}
+
+
+class ScaleEvent(NamedTuple):
+    """One entry in a service's scale history"""
+    ts: int
+    action: int
+    from_replicas: int
+    to_replicas: int
+    rps: float
+
+
 @dataclass
 class ServiceState:
-    """Track state for each service"""
+    """Track non-numeric state for each service"""
     service_name: str
-    current_replicas: int = 1
-    raw_rps: float = 0.0
-    smoothed_rps: float = 0.0
-    last_scale_time: float = 0.0
-    scale_history: List[Dict] = field(default_factory=list)
+    # Ring buffer - oldest events drop off once it is full
+    scale_history: Deque[ScaleEvent] = field(
+        default_factory=lambda: deque(maxlen=AutoscalerConfig.SCALE_HISTORY_SIZE)
+    )
+
+
+class ServicePlan(NamedTuple):
+    """Everything a tick needs for one service, resolved when the service set is listed"""
+    service: str
+    row: int
+    rps_query: str
+    state: ServiceState
+
+
+class ServiceTable:
+    """Numeric per-service state as contiguous columns, one row per service"""
+    
+    # Column name -> value of an unused row
+    COLUMNS = (('current_replicas', 1), ('raw_rps', 0.0),
+               ('smoothed_rps', 0.0), ('last_scale_time', 0.0))
+    
+    def __init__(self, capacity: int = 16):
+        self.index: Dict[str, int] = {}
+        self.current_replicas = np.ones(capacity, dtype=np.int64)
+        self.raw_rps = np.zeros(capacity)
+        self.smoothed_rps = np.zeros(capacity)
+        self.last_scale_time = np.zeros(capacity)
+        
+        # Rows freed by release(), handed out again before the table grows
+        self._free: List[int] = []
+        self._used = 0
+    
+    def row(self, service: str) -> int:
+        """Return the row for a service, adding one if it is new"""
+        row = self.index.get(service)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = self._used
+                self._used += 1
+                if row == len(self.raw_rps):
+                    self._grow()
+            self.index[service] = row
+        return row
+    
+    def release(self, service: str):
+        """Reset a removed service's row and make it available for reuse"""
+        row = self.index.pop(service, None)
+        if row is not None:
+            for name, fill in self.COLUMNS:
+                getattr(self, name)[row] = fill
+            self._free.append(row)
+    
+    def _grow(self):
+        """Double the capacity of every column"""
+        capacity = 2 * len(self.raw_rps)
+        for name, fill in self.COLUMNS:
+            column = getattr(self, name)
+            grown = np.full(capacity, fill, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
 
 
 # ==================== PROMETHEUS INTEGRATION ====================
 class PrometheusClient:
     """Interface to Prometheus for metrics collection"""
     
-    def __init__(self, url: str):
+    # Transient failures worth retrying (dropped keep-alive connections, gateway errors)
+    RETRY_STATUSES = (502, 503, 504)
+    
+    # Prometheus duration units, in seconds
+    DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800, 'y': 31536000}
+    
+    @staticmethod
+    def label_regex(values: List[str]) -> str:
+        """Regex alternation matching exactly these label values, escaped for a PromQL string"""
+        # Regex-escape each value (e.g. '.' in DNS names), then escape backslashes for the string literal
+        return "|".join(re.escape(value) for value in values).replace('\\', '\\\\')
+    
+    def __init__(self, url: str, interval: int, retries: int = 2, backoff: float = 0.5,
+                 rate_range: str = "1m", query_timeout: float = 5):
         self.url = url.rstrip('/')
+        self.interval = interval
+        self.query_timeout = query_timeout
+        self.rate_range = rate_range
+        self.retries = retries
+        self.backoff = backoff
         self.logger = logging.getLogger('PrometheusClient')
+        self.session: Optional[aiohttp.ClientSession] = None
+        
+        # Instant-query results, keyed by (query, tick bucket) so they expire at tick boundaries
+        self.cache: TTLCache = TTLCache(maxsize=512, ttl=max(interval - 1, 1))
     
-    def query(self, query: str) -> Optional[Dict]:
-        """Execute a PromQL query"""
-        try:
-            response = requests.get(
-                f"{self.url}/api/v1/query",
-                params={'query': query},
-                timeout=10
+    async def connect(self):
+        """Open the shared HTTP session (must run inside the event loop)"""
+        if self.session is None:
+            # Pooled keep-alive connections, reused across queries and ticks
+            connector = aiohttp.TCPConnector(limit=32, keepalive_timeout=75)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                # Client-side deadline just past the server-side query timeout
+                timeout=aiohttp.ClientTimeout(total=self.query_timeout + 1),
+                headers={'Connection': 'keep-alive'}
             )
-            response.raise_for_status()
-            data = response.json()
-            
-            if data['status'] == 'success':
-                return data['data']
-            else:
-                self.logger.error(f"Query failed: {data}")
-                return None
-                
-        except Exception as e:
-            self.logger.error(f"Prometheus query error: {e}")
+    
+    async def close(self):
+        """Close the shared HTTP session"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+    
+    async def get_scrape_interval(self) -> Optional[float]:
+        """Read the global scrape interval (seconds) from the running Prometheus config"""
+        result = await self._request("status/config", {})
+        if not result:
+            return None
+        
+        # Only look inside the indented block under the top-level 'global:' key
+        block = re.search(r'^global:[ \t]*\n((?:[ \t]+.*\n?)*)', result.get('yaml', ''), re.M)
+        match = block and re.search(r'^\s+scrape_interval:\s*(\S+)', block.group(1), re.M)
+        if not match:
+            return None
+        
+        parts = re.findall(r'(\d+)(ms|[smhdwy])', match.group(1))
+        if not parts:
+            return None
+        return sum(int(value) * self.DURATION_UNITS[unit] for value, unit in parts)
+    
+    async def query(self, query: str) -> Optional[Dict]:
+        """Execute a PromQL query (cached for the current control interval)"""
+        key = (query, int(time.time() // self.interval))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        result = await self._request(
+            "query",
+            {'query': query, 'timeout': f"{self.query_timeout:g}s"}
+        )
+        if result is not None:
+            self.cache[key] = result
+        return result
+    
+    async def query_range(self, query: str, start: float, end: float, step: float) -> Optional[Dict]:
+        """Execute a PromQL range query"""
+        return await self._request(
+            "query_range",
+            {'query': query, 'start': start, 'end': end, 'step': step,
+             'timeout': f"{self.query_timeout:g}s"}
+        )
+    
+    async def _request(self, endpoint: str, params: Dict) -> Optional[Dict]:
+        """GET a Prometheus HTTP API endpoint and return its 'data' payload"""
+        try:
+            # One deadline for the query as a whole, retries and backoff included
+            async with asyncio.timeout(self.query_timeout + 1):
+                for attempt in range(self.retries + 1):
+                    try:
+                        await self.connect()
+                        async with self.session.get(
+                            f"{self.url}/api/v1/{endpoint}",
+                            params=params
+                        ) as response:
+                            response.raise_for_status()
+                            # orjson decodes large bulk/range payloads far faster than stdlib json
+                            data = orjson.loads(await response.read())
+                        
+                        if data['status'] == 'success':
+                            return data['data']
+                        else:
+                            self.logger.error(f"Query failed: {data}")
+                            return None
+                        
+                    except (aiohttp.ClientConnectionError, aiohttp.ClientResponseError) as e:
+                        # A timed-out attempt already used up the budget - don't retry it
+                        transient = (
+                            isinstance(e, aiohttp.ClientConnectionError)
+                            and not isinstance(e, asyncio.TimeoutError)
+                        ) or (
+                            isinstance(e, aiohttp.ClientResponseError)
+                            and e.status in self.RETRY_STATUSES
+                        )
+                        if transient and attempt < self.retries:
+                            await asyncio.sleep(self.backoff * 2 ** attempt)
+                            continue
+                        self.logger.error(f"Prometheus query error: {e!r}")
+                        return None
+                        
+                    except Exception as e:
+                        self.logger.error(f"Prometheus query error: {e!r}")
+                        return None
+        except TimeoutError as e:
+            self.logger.error(f"Prometheus query error: {e!r}")
             return None
     
-    def get_rps(self, service: str, query_template: str) -> Optional[float]:
-        """Get current RPS for a service"""
-        query = query_template.format(service=service)
-        result = self.query(query)
+    async def query_by_service(self, query: str) -> Dict[str, float]:
+        """Run an already formatted by-service query and map each service to its value"""
+        result = await self.query(query)
         
+        rps: Dict[str, float] = {}
         if result and result.get('result'):
-            # Extract value from Prometheus response
-            value = result['result'][0]['value'][1]
-            return float(value)
+            # One sample per service label in the returned vector
+            for sample in result['result']:
+                service = sample['metric'].get('service')
+                if service is not None:
+                    rps[service] = float(sample['value'][1])
+        
+        return rps
+    
+    async def warmup_smoothed(self, query: str, alpha: float,
+                              window_s: float, step_s: float) -> Optional[float]:
+        """Compute the EMA of a service's recent RPS history in closed form"""
+        end = time.time()
+        result = await self.query_range(query, end - window_s, end, step_s)
+        
+        if not (result and result.get('result')):
+            return None
         
-        return None
+        x = np.asarray([float(v) for _, v in result['result'][0]['values']])
+        if x.size == 0:
+            return None
+        
+        # s_n = (1-α)^n·x_0 + Σ α(1-α)^(n-k)·x_k  - the EMA recurrence unrolled
+        w = (1 - alpha) ** np.arange(len(x) - 1, -1, -1)
+        w[1:] *= alpha
+        return float(w @ x)
 
 
 # ==================== KUBERNETES INTEGRATION ====================
+class DeploymentCache:
+    """In-memory view of deployments in a namespace, kept current by a watch"""
+    
+    def __init__(self, apps_v1: client.AppsV1Api, namespace: str):
+        self.apps_v1 = apps_v1
+        self.namespace = namespace
+        self.logger = logging.getLogger('DeploymentCache')
+        
+        # name -> spec.replicas
+        self.deployments: Dict[str, int] = {}
+        self.synced = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+    
+    async def start(self):
+        """Start the watch task and wait for the initial list"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        await self.synced.wait()
+    
+    async def stop(self):
+        """Cancel the watch task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def get(self, service: str) -> Optional[int]:
+        """Return the cached replica count for a service, if known"""
+        return self.deployments.get(service)
+    
+    def store(self, deployment: client.V1Deployment):
+        """Insert or replace a deployment's replica count in the cache"""
+        self.deployments[deployment.metadata.name] = deployment.spec.replicas
+    
+    async def _run(self):
+        """List once, then apply watch events until cancelled"""
+        while True:
+            try:
+                # Full list gives a consistent snapshot and a resourceVersion to watch from
+                deployments = await self.apps_v1.list_namespaced_deployment(
+                    namespace=self.namespace
+                )
+                self.deployments = {}
+                for deployment in deployments.items:
+                    self.store(deployment)
+                self.synced.set()
+                self.logger.info(f"Synced {len(self.deployments)} deployments")
+                
+                w = watch.Watch()
+                async with w.stream(
+                    self.apps_v1.list_namespaced_deployment,
+                    namespace=self.namespace,
+                    resource_version=deployments.metadata.resource_version
+                ) as stream:
+                    async for event in stream:
+                        deployment = event['object']
+                        if event['type'] in ('ADDED', 'MODIFIED'):
+                            self.store(deployment)
+                        elif event['type'] == 'DELETED':
+                            self.deployments.pop(deployment.metadata.name, None)
+                            
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Deployment watch error, re-listing: {e}")
+                # Unblock start() even if the first list failed; lookups fall back to GET
+                self.synced.set()
+                await asyncio.sleep(5)
+
+
 class KubernetesScaler:
     """Interface to Kubernetes API for scaling operations"""
     
-    def __init__(self, namespace: str):
+    def __init__(self, namespace: str, max_in_flight: int = 8):
         self.namespace = namespace
         self.logger = logging.getLogger('KubernetesScaler')
-        
-        # Load kubernetes config
+        # Caps concurrent API calls so a large fan-out doesn't get throttled (429)
+        self._k8s_sem = asyncio.Semaphore(max_in_flight)
+        self.api_client: Optional[client.ApiClient] = None
+        self.apps_v1: Optional[client.AppsV1Api] = None
+        self.cache: Optional[DeploymentCache] = None
+    
+    async def connect(self):
+        """Load kubernetes config and create the API client"""
         try:
             config.load_incluster_config()  # For in-cluster deployment
             self.logger.info("Loaded in-cluster Kubernetes config")
         except:
-            config.load_kube_config()  # For local development
+            await config.load_kube_config()  # For local development
             self.logger.info("Loaded local Kubernetes config")
         
-        self.apps_v1 = client.AppsV1Api()
+        self.api_client = client.ApiClient()
+        self.apps_v1 = client.AppsV1Api(self.api_client)
+        
+        # Replica counts are served from a watch-backed cache instead of per-tick GETs
+        self.cache = DeploymentCache(self.apps_v1, self.namespace)
+        await self.cache.start()
+    
+    async def close(self):
+        """Stop the deployment watch and close the underlying API client"""
+        if self.cache is not None:
+            await self.cache.stop()
+            self.cache = None
+        if self.api_client is not None:
+            await self.api_client.close()
+            self.api_client = None
     
-    def get_current_replicas(self, service: str) -> Optional[int]:
+    async def get_current_replicas(self, service: str) -> Optional[int]:
         """Get current replica count for a deployment"""
+        cached = self.cache.get(service) if self.cache else None
+        if cached is not None:
+            return cached
+        
+        # Not seen by the watch yet - fall back to a direct read
         try:
-            deployment = self.apps_v1.read_namespaced_deployment(
-                name=service,
-                namespace=self.namespace
-            )
+            async with self._k8s_sem:
+                deployment = await self.apps_v1.read_namespaced_deployment(
+                    name=service,
+                    namespace=self.namespace
+                )
+            if self.cache is not None:
+                self.cache.store(deployment)
             return deployment.spec.replicas
         except client.exceptions.ApiException as e:
             self.logger.error(f"Failed to get replicas for {service}: {e}")
             return None
     
-    def scale_deployment(self, service: str, replicas: int) -> bool:
+    async def scale_deployment(self, service: str, replicas: int) -> bool:
         """Scale a deployment to specified replica count"""
         try:
-            # Read current deployment
-            deployment = self.apps_v1.read_namespaced_deployment(
-                name=service,
-                namespace=self.namespace
-            )
-            
-            # Update replica count
-            deployment.spec.replicas = replicas
-            
-            # Patch the deployment
-            self.apps_v1.patch_namespaced_deployment(
-                name=service,
-                namespace=self.namespace,
-                body=deployment
-            )
+            # Merge-patch the /scale subresource - no read-modify-write of the full object
+            async with self._k8s_sem:
+                await self.apps_v1.patch_namespaced_deployment_scale(
+                    name=service,
+                    namespace=self.namespace,
+                    body={"spec": {"replicas": replicas}},
+                    _content_type="application/merge-patch+json"
+                )
             
             self.logger.info(f"✅ Scaled {service} to {replicas} replicas")
             return True
@@ -161,10 +493,14 @@ class KubernetesScaler:
             self.logger.error(f"Failed to scale {service}: {e}")
             return False
     
-    def list_deployments(self) -> List[str]:
+    async def list_deployments(self) -> List[str]:
         """List all deployments in namespace"""
+        # The watch already tracks the live set - only hit the API before it exists
+        if self.cache is not None:
+            return sorted(self.cache.deployments)
+        
         try:
-            deployments = self.apps_v1.list_namespaced_deployment(
+            deployments = await self.apps_v1.list_namespaced_deployment(
                 namespace=self.namespace
             )
             return [d.metadata.name for d in deployments.items]
@@ -180,55 +516,71 @@ class ReactiveScalingEngine:
     def __init__(self, config: AutoscalerConfig):
         self.config = config
         self.logger = logging.getLogger('ScalingEngine')
-    
-    def update_smoothed_rps(self, state: ServiceState, new_rps: float) -> float:
-        """Calculate exponential moving average"""
-        if state.smoothed_rps == 0.0:
-            state.smoothed_rps = new_rps
-        else:
-            state.smoothed_rps = (
-                self.config.EMA_ALPHA * new_rps + 
-                (1 - self.config.EMA_ALPHA) * state.smoothed_rps
-            )
         
-        state.raw_rps = new_rps
-        return state.smoothed_rps
+        # Hoisted config constants - decide() reads these instead of walking self.config
+        self._alpha = config.EMA_ALPHA
+        self._cooldown = config.COOLDOWN_PERIOD
+        self._min = config.MIN_REPLICAS
+        self._max = config.MAX_REPLICAS
+        
+        # Threshold tables as sorted arrays for the vectorized lookups
+        self._up = np.array(config.RPS_UP_THRESHOLDS)
+        self._down = np.array(config.RPS_DOWN_THRESHOLDS)
+        self._top = len(self._up) - 1
     
-    def desired_replicas(self, current_replicas: int, smoothed_rps: float) -> tuple[int, str]:
-        """Determine desired replicas with hysteresis"""
-        scale_up_threshold, scale_down_threshold = self.config.RPS_THRESHOLDS[current_replicas]
+    def decide(self, table: ServiceTable, rows: np.ndarray, raw_rps: np.ndarray,
+               now: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        EMA update, threshold lookup and cooldown check for many services in one pass
         
-        # Check scale UP
-        if smoothed_rps >= scale_up_threshold and current_replicas < self.config.MAX_REPLICAS:
-            for replicas in range(current_replicas + 1, self.config.MAX_REPLICAS + 1):
-                up_thresh, _ = self.config.RPS_THRESHOLDS[replicas]
-                if smoothed_rps < up_thresh:
-                    return replicas, f"Scale up: RPS {smoothed_rps:.1f} >= {scale_up_threshold:.1f}"
-            return self.config.MAX_REPLICAS, f"Scale to max: RPS {smoothed_rps:.1f}"
+        Returns: (desired_replicas, can_scale, reason_codes), one entry per row
+        """
+        up, down = self._up, self._down
         
-        # Check scale DOWN
-        elif smoothed_rps < scale_down_threshold and current_replicas > self.config.MIN_REPLICAS:
-            for replicas in range(current_replicas - 1, self.config.MIN_REPLICAS - 1, -1):
-                _, down_thresh = self.config.RPS_THRESHOLDS[replicas]
-                if smoothed_rps >= down_thresh or replicas == self.config.MIN_REPLICAS:
-                    return replicas, f"Scale down: RPS {smoothed_rps:.1f} < {scale_down_threshold:.1f}"
-            return self.config.MIN_REPLICAS, f"Scale to min: RPS {smoothed_rps:.1f}"
+        # Exponential moving average - services without history start from the raw sample
+        previous = table.smoothed_rps[rows]
+        smoothed = np.where(previous == 0.0, raw_rps, self._alpha * raw_rps + (1 - self._alpha) * previous)
+        table.smoothed_rps[rows] = smoothed
+        table.raw_rps[rows] = raw_rps
         
-        return current_replicas, f"Stable: RPS {smoothed_rps:.1f} in range"
-    
-    def should_scale(self, state: ServiceState, desired: int) -> tuple[bool, str]:
-        """Check if scaling is allowed (cooldown logic)"""
-        if desired == state.current_replicas:
-            return True, "No change needed"
+        # Hysteresis: replica counts above the table (e.g. scaled by hand) use its last row
+        current = table.current_replicas[rows]
+        row = np.minimum(current, self._top)
+        # Deployments below MIN_REPLICAS (e.g. scaled to 0 by hand) are treated as paused
+        paused = current < self._min
+        scale_up = (smoothed >= up[row]) & (current < self._max) & ~paused
+        scale_down = (smoothed < down[row]) & (current > self._min)
         
-        current_time = time.time()
-        time_since_last_scale = current_time - state.last_scale_time
+        # Scale UP: smallest replica count whose scale-up threshold is above the RPS
+        up_target = np.searchsorted(up, smoothed, side='right')
+        # Scale DOWN: largest replica count whose scale-down threshold the RPS still meets
+        down_target = np.maximum(np.searchsorted(down, smoothed, side='right') - 1, self._min)
         
-        if time_since_last_scale < self.config.COOLDOWN_PERIOD:
-            wait_time = int(self.config.COOLDOWN_PERIOD - time_since_last_scale)
-            return False, f"Cooldown: wait {wait_time}s"
+        desired = np.where(
+            scale_up,
+            np.minimum(up_target, self._max),
+            np.where(scale_down, down_target, current)
+        )
+        reasons = np.where(
+            scale_up,
+            np.where(up_target > self._max, Reason.SCALE_UP_MAX, Reason.SCALE_UP),
+            np.where(scale_down, Reason.SCALE_DOWN, Reason.STABLE)
+        )
+        reasons[paused] = Reason.PAUSED
         
-        return True, "Cooldown expired"
+        # Cooldown
+        can_scale = (desired == current) | (now - table.last_scale_time[rows] >= self._cooldown)
+        reasons[~can_scale] = Reason.COOLDOWN
+        return desired, can_scale, reasons
+    
+    def reason_args(self, current_replicas: int, smoothed_rps: float) -> Dict[str, float]:
+        """Values referenced by the REASON_MESSAGES templates"""
+        row = min(current_replicas, self._top)
+        return {
+            'rps': smoothed_rps,
+            'up': float(self._up[row]),
+            'down': float(self._down[row]),
+        }
 
 
 # ==================== MAIN AUTOSCALER ====================
@@ -240,14 +592,26 @@ class LiveReactiveAutoscaler:
         self.logger = self._setup_logging()
         
         # Initialize components
-        self.prometheus = PrometheusClient(config.PROMETHEUS_URL)
-        self.k8s = KubernetesScaler(config.KUBERNETES_NAMESPACE)
+        self.prometheus = PrometheusClient(
+            config.PROMETHEUS_URL,
+            config.METRICS_QUERY_INTERVAL,
+            rate_range=config.DEFAULT_RATE_RANGE,
+            query_timeout=config.QUERY_TIMEOUT_S
+        )
+        self.k8s = KubernetesScaler(
+            config.KUBERNETES_NAMESPACE,
+            config.K8S_MAX_IN_FLIGHT
+        )
         self.engine = ReactiveScalingEngine(config)
         
-        # Service states
-        self.service_states: Dict[str, ServiceState] = defaultdict(
-            lambda: ServiceState(service_name="")
-        )
+        # Service states: numeric columns in the table, history per service
+        self.table = ServiceTable()
+        self.service_states: Dict[str, ServiceState] = {}
+        
+        # Service set specialized from the last deployment listing
+        self.plans: Tuple[ServicePlan, ...] = ()
+        self._bulk_query = ""
+        self._plans_built_at = 0.0
         
         self.logger.info("🚀 Live Reactive Autoscaler initialized")
     
@@ -259,85 +623,187 @@ class LiveReactiveAutoscaler:
         )
         return logging.getLogger('Autoscaler')
     
-    def control_loop_iteration(self):
+    async def configure_rate_range(self):
+        """Size the rate() window to a fixed number of Prometheus scrape intervals"""
+        scrape_interval = await self.prometheus.get_scrape_interval()
+        if scrape_interval is None:
+            self.logger.warning(
+                f"Could not read scrape interval, using rate range {self.prometheus.rate_range}"
+            )
+            return
+        
+        seconds = max(int(round(self.config.RATE_RANGE_SCRAPES * scrape_interval)), 1)
+        self.prometheus.rate_range = f"{seconds}s"
+        self.logger.info(f"Scrape interval {scrape_interval:g}s -> rate range {self.prometheus.rate_range}")
+    
+    async def refresh_plans(self):
+        """Pre-resolve queries, table rows and state for the current deployment set"""
+        services = await self.k8s.list_deployments()
+        self._plans_built_at = time.time()
+        
+        if services == [plan.service for plan in self.plans]:
+            return
+        
+        previous = {plan.service for plan in self.plans}
+        
+        # Reclaim table rows and state of deployments that are gone
+        for service in previous.difference(services):
+            self.table.release(service)
+            self.service_states.pop(service, None)
+        
+        rate_range = self.prometheus.rate_range
+        query_template = self.config.RPS_METRIC_QUERY
+        self.plans = tuple(
+            ServicePlan(
+                service,
+                self.table.row(service),
+                query_template.format(service=service, range=rate_range),
+                self.service_states.get(service) or self.service_states.setdefault(
+                    service, ServiceState(service_name=service)
+                )
+            )
+            for service in services
+        )
+        self._bulk_query = self.config.RPS_BULK_METRIC_QUERY.format(
+            services=self.prometheus.label_regex(services), range=rate_range
+        )
+        
+        if services:
+            self.logger.info(f"Monitoring {len(services)} services: {services}")
+        
+        # Services new to this listing start from history rather than a cold EMA
+        await self.warm_up([plan for plan in self.plans if plan.service not in previous])
+    
+    async def warm_up(self, plans: List[ServicePlan]):
+        """Seed each service's smoothed RPS from recent Prometheus history"""
+        results = await asyncio.gather(
+            *(
+                self.prometheus.warmup_smoothed(
+                    plan.rps_query,
+                    self.config.EMA_ALPHA,
+                    self.config.WARMUP_WINDOW,
+                    self.config.METRICS_QUERY_INTERVAL
+                )
+                for plan in plans
+            ),
+            return_exceptions=True
+        )
+        
+        for plan, smoothed in zip(plans, results):
+            if isinstance(smoothed, Exception):
+                self.logger.error(f"Warm-up failed for {plan.service}: {smoothed!r}")
+            elif isinstance(smoothed, float):
+                self.table.smoothed_rps[plan.row] = smoothed
+                self.logger.info(f"Warm-started {plan.service}: smoothed RPS {smoothed:.1f}")
+    
+    async def control_loop_iteration(self):
         """Single iteration of the control loop"""
-        # Get list of services to monitor
-        services = self.k8s.list_deployments()
+        # Re-list deployments only every PLAN_REFRESH_INTERVAL (or until some are found)
+        if not self.plans or time.time() - self._plans_built_at >= self.config.PLAN_REFRESH_INTERVAL:
+            await self.refresh_plans()
         
-        if not services:
+        plans = self.plans
+        if not plans:
             self.logger.warning("No deployments found")
             return
         
-        self.logger.info(f"Monitoring {len(services)} services: {services}")
+        # Fetch RPS for every service in one Prometheus round-trip
+        rps_by_service = await self.prometheus.query_by_service(self._bulk_query)
         
-        for service in services:
-            try:
-                self.process_service(service)
-            except Exception as e:
-                self.logger.error(f"Error processing {service}: {e}")
-    
-    def process_service(self, service: str):
-        """Process scaling decision for a single service"""
-        # Get current state
-        state = self.service_states[service]
-        state.service_name = service
-        
-        # Step 1: Get current RPS from Prometheus
-        rps = self.prometheus.get_rps(service, self.config.RPS_METRIC_QUERY)
-        if rps is None:
-            self.logger.warning(f"No RPS data for {service}")
+        # Step 1: Services without RPS data are skipped this tick
+        live = []
+        for plan in plans:
+            if plan.service in rps_by_service:
+                live.append(plan)
+            else:
+                self.logger.warning(f"No RPS data for {plan.service}")
+        
+        if not live:
             return
         
-        # Step 2: Update smoothed RPS
-        smoothed_rps = self.engine.update_smoothed_rps(state, rps)
+        rows = np.array([plan.row for plan in live], dtype=np.intp)
         
-        # Step 3: Get current replicas from Kubernetes
-        current_k8s_replicas = self.k8s.get_current_replicas(service)
-        if current_k8s_replicas is None:
-            return
+        # Step 2: Get current replicas from Kubernetes and sync state with K8s reality
+        replicas = await asyncio.gather(
+            *(self.k8s.get_current_replicas(plan.service) for plan in live)
+        )
+        known = np.array([r is not None for r in replicas])
+        self.table.current_replicas[rows[known]] = [r for r in replicas if r is not None]
         
-        # Sync state with K8s reality
-        state.current_replicas = current_k8s_replicas
+        # Step 3: Smooth RPS, pick desired replicas and check cooldown in one vectorized pass
+        now = time.time()
+        desired, can_scale, reasons = self.engine.decide(
+            self.table,
+            rows,
+            np.array([rps_by_service[plan.service] for plan in live]),
+            now
+        )
+        
+        # Services whose replica count is unknown are smoothed but not acted on
+        live = [plan for plan, ok in zip(live, known) if ok]
+        desired, can_scale, reasons = desired[known], can_scale[known], reasons[known]
         
-        # Step 4: Determine desired replicas
-        desired, reason = self.engine.desired_replicas(
-            state.current_replicas,
-            smoothed_rps
+        # Step 4: Act on each service concurrently - the work is I/O-bound
+        results = await asyncio.gather(
+            *(
+                self.process_service(plan, int(target), bool(allowed), Reason(reason), now)
+                for plan, target, allowed, reason in zip(live, desired, can_scale, reasons)
+            ),
+            return_exceptions=True
         )
         
-        # Step 5: Check cooldown
-        can_scale, cooldown_msg = self.engine.should_scale(state, desired)
+        for plan, result in zip(live, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"Error processing {plan.service}: {result}")
+    
+    async def process_service(self, plan: ServicePlan, desired: int, can_scale: bool,
+                              reason: Reason, now: float):
+        """Carry out the scaling decision for a single service"""
+        service, row, state = plan.service, plan.row, plan.state
+        table = self.table
+        
+        current_k8s_replicas = int(table.current_replicas[row])
+        smoothed_rps = float(table.smoothed_rps[row])
         
-        # Step 6: Make decision
-        if desired != state.current_replicas:
-            action = "UPSCALE" if desired > state.current_replicas else "DOWNSCALE"
+        if desired != current_k8s_replicas:
+            action = "UPSCALE" if desired > current_k8s_replicas else "DOWNSCALE"
             
             if can_scale:
                 # Execute scaling
-                success = self.k8s.scale_deployment(service, desired)
+                success = await self.k8s.scale_deployment(service, desired)
                 
                 if success:
-                    state.current_replicas = desired
-                    state.last_scale_time = time.time()
+                    table.current_replicas[row] = desired
+                    table.last_scale_time[row] = time.time()
                     
-                    log_msg = f"🔄 {action}: {service} {current_k8s_replicas}→{desired} | {reason}"
-                    self.logger.info(log_msg)
+                    self.logger.info(
+                        "🔄 %(action)s: %(service)s %(from)d→%(to)d | " + REASON_MESSAGES[reason],
+                        {'action': action, 'service': service, 'from': current_k8s_replicas, 'to': desired,
+                         **self.engine.reason_args(current_k8s_replicas, smoothed_rps)}
+                    )
                     
                     # Record in history
-                    state.scale_history.append({
-                        'timestamp': datetime.now().isoformat(),
-                        'action': action,
-                        'from': current_k8s_replicas,
-                        'to': desired,
-                        'rps': smoothed_rps,
-                        'reason': reason
-                    })
+                    state.scale_history.append(ScaleEvent(
+                        int(time.time()),
+                        ACTION_UPSCALE if desired > current_k8s_replicas else ACTION_DOWNSCALE,
+                        current_k8s_replicas,
+                        desired,
+                        smoothed_rps
+                    ))
             else:
-                self.logger.info(f"⏸️  BLOCKED: {service} | {cooldown_msg}")
-        else:
-            self.logger.debug(f"✓ NO_CHANGE: {service} @ {state.current_replicas} replicas | {reason}")
+                wait_time = int(self.config.COOLDOWN_PERIOD - (now - table.last_scale_time[row]))
+                self.logger.info(
+                    "⏸️  BLOCKED: %(service)s | " + REASON_MESSAGES[reason],
+                    {'service': service, 'wait': wait_time}
+                )
+        elif self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(
+                "✓ NO_CHANGE: %(service)s @ %(replicas)d replicas | " + REASON_MESSAGES[reason],
+                {'service': service, 'replicas': current_k8s_replicas,
+                 **self.engine.reason_args(current_k8s_replicas, smoothed_rps)}
+            )
     
-    def run(self):
+    async def run(self):
         """Main control loop - runs forever"""
         self.logger.info("="*80)
         self.logger.info("Starting Live Reactive Autoscaler")
@@ -346,26 +812,30 @@ class LiveReactiveAutoscaler:
         self.logger.info(f"Control interval: {self.config.METRICS_QUERY_INTERVAL}s")
         self.logger.info("="*80)
         
-        while True:
-            try:
-                loop_start = time.time()
-                
-                # Run control loop
-                self.control_loop_iteration()
-                
-                # Sleep until next interval
-                elapsed = time.time() - loop_start
-                sleep_time = max(0, self.config.METRICS_QUERY_INTERVAL - elapsed)
-                
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
+        await self.prometheus.connect()
+        await self.k8s.connect()
+        
+        try:
+            await self.configure_rate_range()
+            await self.refresh_plans()
+            
+            interval = self.config.METRICS_QUERY_INTERVAL
+            while True:
+                try:
+                    # Run control loop - iterations are awaited one at a time, never overlapped
+                    await self.control_loop_iteration()
                     
-            except KeyboardInterrupt:
-                self.logger.info("\n🛑 Shutting down autoscaler...")
-                break
-            except Exception as e:
-                self.logger.error(f"Control loop error: {e}", exc_info=True)
-                time.sleep(5)  # Brief pause before retry
+                    # Sleep until the next wall-clock multiple of the interval, so ticks
+                    # don't drift and a slow tick skips ahead instead of firing back-to-back
+                    next_tick = (int(time.time()) // interval + 1) * interval
+                    await asyncio.sleep(max(0, next_tick - time.time()))
+                    
+                except Exception as e:
+                    self.logger.error(f"Control loop error: {e}", exc_info=True)
+                    await asyncio.sleep(5)  # Brief pause before retry
+        finally:
+            await self.prometheus.close()
+            await self.k8s.close()
 
 
 # ==================== ENTRY POINT ====================
@@ -373,7 +843,11 @@ def main():
     """Start the live autoscaler"""
     config = AutoscalerConfig()
     autoscaler = LiveReactiveAutoscaler(config)
-    autoscaler.run()
+    
+    try:
+        asyncio.run(autoscaler.run())
+    except KeyboardInterrupt:
+        autoscaler.logger.info("\n🛑 Shutting down autoscaler...")
 
 
 if __name__ == "__main__":
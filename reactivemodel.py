@@ -9,16 +9,23 @@ Improvements:
 5. Better logging and metrics
 """
 
+import csv
+import sys
+import numpy as np
 import pandas as pd
 import time
-from dataclasses import dataclass
-from typing import Dict, List, Tuple
-from collections import defaultdict
+from enum import IntEnum
+from numba import njit
 
 # ==================== CONFIGURATION ====================
 CSV_PATH = "microservice_interactions_3hours.csv"
 CONTROL_INTERVAL = 30  # seconds between control decisions
 OUTPUT_CSV = "enhanced_reactive_output.csv"
+OUTPUT_FIELDS = [
+    "time_bucket", "service", "raw_rps", "smoothed_rps",
+    "prev_replicas", "new_replicas", "action", "reason",
+]
+PRINT_BATCH_SIZE = 1000  # decision lines buffered per stdout write
 
 # Scaling parameters
 COOLDOWN_PERIOD = 60  # seconds to wait between scaling actions
@@ -26,92 +33,137 @@ EMA_ALPHA = 0.7  # weight for exponential moving average (0.7 = 70% current, 30%
 MIN_REPLICAS = 1
 MAX_REPLICAS = 10
 
-# RPS Thresholds with Hysteresis
-# Format: (scale_up_threshold, scale_down_threshold)
-RPS_THRESHOLDS = {
-    1: (10, 0),      # 1 replica: scale up at 10 RPS, never scale down (min)
-    2: (30, 8),      # 2 replicas: scale up at 30 RPS, scale down at 8 RPS
-    3: (60, 25),     # 3 replicas: scale up at 60 RPS, scale down at 25 RPS
-    4: (100, 50),    # 4 replicas: scale up at 100 RPS, scale down at 50 RPS
-    5: (float('inf'), 90)  # 5 replicas: never scale up (max), scale down at 90 RPS
-}
+# RPS Thresholds with Hysteresis, indexed by current replica count
+# (slot 0 is a -inf sentinel so that _UP[replicas] / _DOWN[replicas] line up and stay sorted)
+_UP = np.array([-np.inf, 10.0, 30.0, 60.0, 100.0, np.inf])   # scale up at >= this RPS (5: never, max)
+_DOWN = np.array([-np.inf, 0.0, 8.0, 25.0, 50.0, 90.0])     # scale down below this RPS (1: never, min)
+
+# Action codes produced by the simulation
+ACTION_NO_CHANGE = 0
+ACTION_UPSCALE = 1
+ACTION_DOWNSCALE = 2
+ACTION_BLOCKED = 3
+ACTION_NAMES = ("NO_CHANGE", "UPSCALE", "DOWNSCALE", "BLOCKED")
 
-# ==================== DATA STRUCTURES ====================
-@dataclass
-class ServiceState:
-    """Track state for each service"""
-    current_replicas: int = 1
-    raw_rps: float = 0.0
-    smoothed_rps: float = 0.0
-    last_scale_time: int = 0
-    scale_history: List[Tuple[int, int, float, str]] = None  # (time, replicas, rps, reason)
-    
-    def __post_init__(self):
-        if self.scale_history is None:
-            self.scale_history = []
+
+class Reason(IntEnum):
+    """Reason codes - mapped to text only when results are written out"""
+    STABLE = 0
+    SCALE_UP = 1
+    SCALE_UP_MAX = 2
+    SCALE_DOWN = 3
+    SCALE_DOWN_MIN = 4
+    COOLDOWN = 5
 
 
 # ==================== SCALING LOGIC ====================
-def update_smoothed_rps(state: ServiceState, new_rps: float) -> float:
+def smooth_rps(raw_rps: np.ndarray) -> np.ndarray:
     """
-    Calculate exponential moving average of RPS
+    Calculate exponential moving average of a service's RPS series
     Formula: EMA = α * current + (1-α) * previous
-    """
-    if state.smoothed_rps == 0.0:
-        # First data point, no history
-        state.smoothed_rps = new_rps
-    else:
-        state.smoothed_rps = EMA_ALPHA * new_rps + (1 - EMA_ALPHA) * state.smoothed_rps
     
-    state.raw_rps = new_rps
-    return state.smoothed_rps
+    Leading zero samples carry no history, so the EMA is seeded with
+    the first non-zero sample (same as a cold start).
+    """
+    smoothed = np.zeros_like(raw_rps, dtype=float)
+    nonzero = np.flatnonzero(raw_rps)
+    if nonzero.size:
+        start = nonzero[0]
+        smoothed[start:] = (
+            pd.Series(raw_rps[start:])
+            .ewm(alpha=EMA_ALPHA, adjust=False)
+            .mean()
+            .to_numpy()
+        )
+    return smoothed
 
 
-def desired_replicas_with_hysteresis(current_replicas: int, smoothed_rps: float) -> Tuple[int, str]:
+@njit(cache=True)
+def desired_replicas_with_hysteresis(current_replicas, smoothed_rps, up, down, min_r, max_r):
     """
     Determine desired replicas using hysteresis to prevent flapping
     
-    Returns: (desired_replicas, reason)
+    Returns: (desired_replicas, reason_code)
     """
-    scale_up_threshold, scale_down_threshold = RPS_THRESHOLDS[current_replicas]
+    scale_up_threshold = up[current_replicas]
+    scale_down_threshold = down[current_replicas]
     
     # Check if we should scale UP
-    if smoothed_rps >= scale_up_threshold and current_replicas < MAX_REPLICAS:
-        # Find the right replica count
-        for replicas in range(current_replicas + 1, MAX_REPLICAS + 1):
-            up_thresh, _ = RPS_THRESHOLDS[replicas]
-            if smoothed_rps < up_thresh:
-                return replicas, f"RPS {smoothed_rps:.1f} >= {scale_up_threshold:.1f} (scale-up threshold)"
-        return MAX_REPLICAS, f"RPS {smoothed_rps:.1f} exceeds all thresholds"
+    if smoothed_rps >= scale_up_threshold and current_replicas < max_r:
+        # Smallest replica count whose scale-up threshold is above the RPS
+        replicas = np.searchsorted(up, smoothed_rps, side='right')
+        if replicas > max_r:
+            return max_r, Reason.SCALE_UP_MAX
+        return replicas, Reason.SCALE_UP
     
     # Check if we should scale DOWN
-    elif smoothed_rps < scale_down_threshold and current_replicas > MIN_REPLICAS:
-        # Find the right replica count
-        for replicas in range(current_replicas - 1, MIN_REPLICAS - 1, -1):
-            _, down_thresh = RPS_THRESHOLDS[replicas]
-            if smoothed_rps >= down_thresh or replicas == MIN_REPLICAS:
-                return replicas, f"RPS {smoothed_rps:.1f} < {scale_down_threshold:.1f} (scale-down threshold)"
-        return MIN_REPLICAS, f"RPS {smoothed_rps:.1f} below minimum threshold"
+    elif smoothed_rps < scale_down_threshold and current_replicas > min_r:
+        # Largest replica count whose scale-down threshold the RPS still meets
+        replicas = np.searchsorted(down, smoothed_rps, side='right') - 1
+        if replicas < min_r:
+            return min_r, Reason.SCALE_DOWN
+        return replicas, Reason.SCALE_DOWN
     
     # Stay at current level
-    return current_replicas, f"RPS {smoothed_rps:.1f} within stable range [{scale_down_threshold:.1f}, {scale_up_threshold:.1f})"
+    return current_replicas, Reason.STABLE
 
 
-def should_scale(state: ServiceState, current_time: int, desired: int) -> Tuple[bool, str]:
+@njit(cache=True)
+def simulate(smoothed, times, cooldown, up, down, min_r, max_r):
     """
-    Check if scaling is allowed (cooldown logic)
+    Run the replica/cooldown state machine over one service's time series
     
-    Returns: (can_scale, reason)
+    Returns: (replicas, actions, reason_codes, cooldown_waits), one entry per sample
     """
-    if desired == state.current_replicas:
-        return True, "No change needed"
+    n = len(smoothed)
+    replicas_out = np.empty(n, dtype=np.int64)
+    actions = np.empty(n, dtype=np.int8)
+    reasons = np.empty(n, dtype=np.int8)
+    waits = np.zeros(n, dtype=np.int64)
     
-    time_since_last_scale = current_time - state.last_scale_time
+    current_replicas = 1
+    last_scale_time = 0
     
-    if time_since_last_scale < COOLDOWN_PERIOD:
-        return False, f"In cooldown (wait {COOLDOWN_PERIOD - time_since_last_scale}s)"
+    for i in range(n):
+        time_bucket = times[i]
+        
+        # Determine desired replicas (with hysteresis)
+        desired, reason = desired_replicas_with_hysteresis(
+            current_replicas, smoothed[i], up, down, min_r, max_r
+        )
+        
+        # Check cooldown and make decision
+        if desired == current_replicas:
+            action = ACTION_NO_CHANGE
+        elif time_bucket - last_scale_time < cooldown:
+            action = ACTION_BLOCKED
+            reason = Reason.COOLDOWN
+            waits[i] = cooldown - (time_bucket - last_scale_time)
+        else:
+            action = ACTION_UPSCALE if desired > current_replicas else ACTION_DOWNSCALE
+            current_replicas = desired
+            last_scale_time = time_bucket
+        
+        replicas_out[i] = current_replicas
+        actions[i] = action
+        reasons[i] = reason
     
-    return True, "Cooldown expired, scaling allowed"
+    return replicas_out, actions, reasons, waits
+
+
+def format_reason(reason: Reason, smoothed_rps: float, prev_replicas: int, wait: int) -> str:
+    """Render a reason code as the human-readable text used in the output"""
+    if reason == Reason.SCALE_UP:
+        return f"RPS {smoothed_rps:.1f} >= {_UP[prev_replicas]:.1f} (scale-up threshold)"
+    if reason == Reason.SCALE_UP_MAX:
+        return f"RPS {smoothed_rps:.1f} exceeds all thresholds"
+    if reason == Reason.SCALE_DOWN:
+        return f"RPS {smoothed_rps:.1f} < {_DOWN[prev_replicas]:.1f} (scale-down threshold)"
+    if reason == Reason.SCALE_DOWN_MIN:
+        return f"RPS {smoothed_rps:.1f} below minimum threshold"
+    if reason == Reason.COOLDOWN:
+        return f"In cooldown (wait {wait}s)"
+    return f"RPS {smoothed_rps:.1f} within stable range [{_DOWN[prev_replicas]:.1f}, {_UP[prev_replicas]:.1f})"
 
 
 # ==================== MAIN SIMULATION ====================
@@ -142,17 +194,35 @@ def main():
         .reset_index(drop=True)
     )
     
-    # Initialize service states
-    service_states: Dict[str, ServiceState] = defaultdict(ServiceState)
+    # Vectorized pass per service: EMA in pandas, then the JIT-compiled state machine
+    n = len(grouped)
+    smoothed_rps = np.zeros(n)
+    prev_replicas = np.zeros(n, dtype=np.int64)
+    new_replicas = np.zeros(n, dtype=np.int64)
+    actions = np.zeros(n, dtype=np.int8)
+    reason_codes = np.zeros(n, dtype=np.int8)
+    waits = np.zeros(n, dtype=np.int64)
+    times = grouped["time_bucket"].to_numpy(dtype=np.int64)
+    raw_rps = grouped["total_rps"].to_numpy(dtype=float)
     
-    # Track events for output
-    events = []
+    for idx in grouped.groupby("item", sort=False).indices.values():
+        smoothed = smooth_rps(raw_rps[idx])
+        replicas, svc_actions, svc_reasons, svc_waits = simulate(
+            smoothed, times[idx], COOLDOWN_PERIOD, _UP, _DOWN, MIN_REPLICAS, MAX_REPLICAS
+        )
+        smoothed_rps[idx] = smoothed
+        new_replicas[idx] = replicas
+        prev_replicas[idx] = np.concatenate(([1], replicas[:-1]))
+        actions[idx] = svc_actions
+        reason_codes[idx] = svc_reasons
+        waits[idx] = svc_waits
     
     # Statistics
-    total_scales = 0
-    upscales = 0
-    downscales = 0
-    cooldown_blocks = 0
+    action_counts = np.bincount(actions, minlength=len(ACTION_NAMES))
+    upscales = int(action_counts[ACTION_UPSCALE])
+    downscales = int(action_counts[ACTION_DOWNSCALE])
+    cooldown_blocks = int(action_counts[ACTION_BLOCKED])
+    total_scales = upscales + downscales
     
     print("\n" + "="*120)
     print("ENHANCED REACTIVE AUTOSCALER SIMULATION".center(120))
@@ -160,85 +230,52 @@ def main():
     print(f"{'Time':<12} {'Service':<25} {'Raw RPS':<10} {'Smooth RPS':<12} {'Action':<12} {'Replicas':<10} {'Reason':<40}")
     print("-"*120)
     
-    # Process each time bucket
-    for _, row in grouped.iterrows():
-        time_bucket = int(row["time_bucket"])
-        service = row["item"]
-        raw_rps = float(row["total_rps"])
-        
-        state = service_states[service]
-        
-        # Step 1: Update smoothed RPS
-        smoothed_rps = update_smoothed_rps(state, raw_rps)
-        
-        # Step 2: Determine desired replicas (with hysteresis)
-        desired, scaling_reason = desired_replicas_with_hysteresis(
-            state.current_replicas, 
-            smoothed_rps
-        )
-        
-        # Step 3: Check cooldown
-        can_scale, cooldown_reason = should_scale(state, time_bucket, desired)
-        
-        # Step 4: Make decision
-        prev_replicas = state.current_replicas
-        
-        if desired > prev_replicas:
-            if can_scale:
-                action = "UPSCALE"
-                state.current_replicas = desired
-                state.last_scale_time = time_bucket
-                total_scales += 1
-                upscales += 1
-                reason = scaling_reason
-            else:
-                action = "BLOCKED"
-                cooldown_blocks += 1
-                reason = cooldown_reason
-        elif desired < prev_replicas:
-            if can_scale:
-                action = "DOWNSCALE"
-                state.current_replicas = desired
-                state.last_scale_time = time_bucket
-                total_scales += 1
-                downscales += 1
-                reason = scaling_reason
-            else:
-                action = "BLOCKED"
-                cooldown_blocks += 1
-                reason = cooldown_reason
-        else:
-            action = "NO_CHANGE"
-            reason = scaling_reason
-        
-        # Step 5: Log and record
-        state.scale_history.append((time_bucket, state.current_replicas, smoothed_rps, reason))
-        
-        # Print decision
-        replica_change = f"{prev_replicas} → {state.current_replicas}" if action in ["UPSCALE", "DOWNSCALE"] else f"{state.current_replicas}"
-        print(f"{time_bucket:<12} {service:<25} {raw_rps:<10.2f} {smoothed_rps:<12.2f} {action:<12} {replica_change:<10} {reason:<40}")
+    # Print decisions in time order, streaming each one straight to the output CSV
+    row_fmt = "{:<12} {:<25} {:<10.2f} {:<12.2f} {:<12} {:<10} {:<40}\n".format
+    lines = []
+    
+    with open(OUTPUT_CSV, "w", newline="") as out_file:
+        writer = csv.DictWriter(out_file, fieldnames=OUTPUT_FIELDS, lineterminator="\n")
+        writer.writeheader()
         
-        # Store event
-        events.append({
-            "time_bucket": time_bucket,
-            "service": service,
-            "raw_rps": raw_rps,
-            "smoothed_rps": smoothed_rps,
-            "prev_replicas": prev_replicas,
-            "new_replicas": state.current_replicas,
-            "action": action,
-            "reason": reason
-        })
+        for time_bucket, service, raw, smoothed, prev, new, action_code, reason_code, wait in zip(
+            times.tolist(),
+            grouped["item"],
+            raw_rps.tolist(),
+            smoothed_rps.tolist(),
+            prev_replicas.tolist(),
+            new_replicas.tolist(),
+            actions.tolist(),
+            reason_codes.tolist(),
+            waits.tolist(),
+        ):
+            action = ACTION_NAMES[action_code]
+            reason = format_reason(reason_code, smoothed, prev, wait)
+            
+            replica_change = f"{prev} → {new}" if action in ["UPSCALE", "DOWNSCALE"] else f"{new}"
+            lines.append(row_fmt(time_bucket, service, raw, smoothed, action, replica_change, reason))
+            if len(lines) >= PRINT_BATCH_SIZE:
+                sys.stdout.write("".join(lines))
+                lines.clear()
+            
+            writer.writerow({
+                "time_bucket": time_bucket,
+                "service": service,
+                "raw_rps": raw,
+                "smoothed_rps": smoothed,
+                "prev_replicas": prev,
+                "new_replicas": new,
+                "action": action,
+                "reason": reason,
+            })
     
-    # Save results
-    out_df = pd.DataFrame(events)
-    out_df.to_csv(OUTPUT_CSV, index=False)
+    sys.stdout.write("".join(lines))
     
     # Print summary statistics
     print("\n" + "="*120)
     print("SIMULATION SUMMARY".center(120))
     print("="*120)
-    print(f"Total events processed:    {len(events)}")
+    print(f"Total events processed:    {n}")
     print(f"Total scaling actions:     {total_scales}")
     print(f"  ↑ Upscales:              {upscales}")
     print(f"  ↓ Downscales:            {downscales}")